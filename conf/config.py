@@ -11,6 +11,11 @@ class Settings(BaseSettings):
     DB_TEST_URL: Optional[str] = os.environ.get("DB_TEST_URL")
     SECRET_KEY_JWT: str = os.environ.get("SECRET_KEY_JWT")
     ALGORITHM: str = os.environ.get('ALGORITHM')
+    DB_POOL_SIZE: int = int(os.environ.get("DB_POOL_SIZE", 20))
+    DB_MAX_OVERFLOW: int = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_TIMEOUT: int = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+    BCRYPT_ROUNDS: int = int(os.environ.get("BCRYPT_ROUNDS", 12))
 
 
 
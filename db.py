@@ -8,7 +8,15 @@ from conf.config import config
 
 class DatabaseSessionManager:
     def __init__(self, url: str):
-        self._engine: AsyncEngine = create_async_engine(url, echo=False)
+        self._engine: AsyncEngine = create_async_engine(
+            url,
+            echo=False,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+        )
         self._session_maker = sessionmaker(
             bind=self._engine, expire_on_commit=False, class_=AsyncSession
         )
@@ -26,6 +34,17 @@ class DatabaseSessionManager:
             finally:
                 await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(self):
+        async with self._session_maker() as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    def pool_status(self) -> str:
+        return self._engine.pool.status()
+
     async def close(self):
         await self._engine.dispose()
 
@@ -35,4 +54,9 @@ sessionmanager = DatabaseSessionManager(config.DB_URL)
 
 async def get_db():
     async with sessionmanager.session() as session:
+        yield session
+
+
+async def get_read_db():
+    async with sessionmanager.read_session() as session:
         yield session
\ No newline at end of file
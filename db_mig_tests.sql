@@ -24,4 +24,8 @@ CREATE TABLE IF NOT EXISTS books (
     author_id INTEGER NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (author_id) REFERENCES authors(id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+CREATE INDEX IF NOT EXISTS ix_books_title_id ON books (title, id);
+CREATE INDEX IF NOT EXISTS ix_books_published_year ON books (published_year);
+CREATE INDEX IF NOT EXISTS ix_books_genre ON books (genre);
\ No newline at end of file
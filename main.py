@@ -2,12 +2,14 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, APIRouter, status, Query, UploadFile
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from typing import List, Optional
+from typing import Optional
 import csv, json, io
+import logging
 
-from db import get_db
+from db import get_db, get_read_db, sessionmanager
 from services import (
     signup,
     signin,
@@ -20,7 +22,7 @@ from services import (
     bulk_import,
     get_current_user,
 )
-from schemas import UserSignup, UserSignin, BookCreate, BookUpdate, BookOut, BulkImportResult
+from schemas import UserSignup, UserSignin, BookCreate, BookUpdate, BookOut, BulkImportResult, PaginatedBooks
 
 # --- FastAPI app ---
 @asynccontextmanager
@@ -29,6 +31,7 @@ async def lifespan(_: FastAPI):
 
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="Library API",
     description="""
 A simple API for managing books and users.
@@ -128,7 +131,7 @@ async def logout(current_user: dict = Depends(get_current_user), db: AsyncSessio
     Sign out the current user.
     """
     try:
-        return await signout(current_user, db)
+        return await signout(current_user["email"], db)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -136,9 +139,12 @@ async def logout(current_user: dict = Depends(get_current_user), db: AsyncSessio
 
 
 # --- Book endpoints ---
+# Сервисы уже возвращают провалидированные BookOut/BulkImportResult, поэтому response_model
+# не задаём, чтобы FastAPI не валидировал ответ повторно. Схемы для документации указаны в responses
 @router.post(
     "/",
-    response_model=BookOut,
+    response_model=None,
+    responses={201: {"model": BookOut}},
     status_code=status.HTTP_201_CREATED,
     summary="Add a new book",
     description="Add a new book to the library. Requires authentication."
@@ -158,16 +164,23 @@ async def add_book(book: BookCreate, db: AsyncSession = Depends(get_db), user=De
 
 @router.get(
     "/",
-    response_model=List[BookOut],
+    response_model=None,
+    responses={200: {"model": PaginatedBooks}},
     status_code=status.HTTP_200_OK,
     summary="List books",
     description="""
 Get a paginated list of books.  
 Supports filtering by title, author, genre, year range, and sorting.
+The response includes `total`, the number of books matching the filters
+(null when the requested page is past the last one).
+
+When sorting by title, pass `next_cursor` values from the previous page as
+`last_title` and `last_id` to fetch the next page without OFFSET
+(`total` is not computed in this mode). `next_cursor` is null on the last page.
 """
 )
 async def get_books(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Books per page"),
     title: Optional[str] = Query(None, description="Filter by title"),
@@ -177,24 +190,33 @@ async def get_books(
     year_to: Optional[int] = Query(None, description="Published year to"),
     sort_by: str = Query("title", description="Sort by field"),
     sort_order: str = Query("asc", description="Sort order: asc or desc"),
+    last_title: Optional[str] = Query(None, description="Cursor: title of the last book on the previous page"),
+    last_id: Optional[int] = Query(None, description="Cursor: ID of the last book on the previous page"),
 ):
     """
     List books with filters, pagination, and sorting.
     """
     try:
-        return await list_books(db, page, page_size, title, author, genre, year_from, year_to, sort_by, sort_order)
+        books_page = await list_books(
+            db, page, page_size, title, author, genre, year_from, year_to, sort_by, sort_order, last_title, last_id
+        )
+        # Строки из БД уже имеют форму PaginatedBooks, отдаём их orjson напрямую без повторной валидации
+        return ORJSONResponse(books_page)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching books: {str(e)}")
 
 
 @router.get(
     "/{book_id}",
-    response_model=BookOut,
+    response_model=None,
+    responses={200: {"model": BookOut}},
     status_code=status.HTTP_200_OK,
     summary="Get book by ID",
     description="Get a single book by its ID."
 )
-async def get_book_by_id(book_id: int, db: AsyncSession = Depends(get_db)):
+async def get_book_by_id(book_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Get a book by its ID.
     """
@@ -211,7 +233,8 @@ async def get_book_by_id(book_id: int, db: AsyncSession = Depends(get_db)):
 
 @router.put(
     "/{book_id}",
-    response_model=BookOut,
+    response_model=None,
+    responses={200: {"model": BookOut}},
     status_code=status.HTTP_200_OK,
     summary="Update book by ID",
     description="Update an existing book by its ID. Requires authentication."
@@ -257,7 +280,8 @@ async def delete_book_by_id(book_id: int, db: AsyncSession = Depends(get_db), us
 # --- Bulk import endpoint ---
 @router.post(
     "/bulk-import",
-    response_model=BulkImportResult,
+    response_model=None,
+    responses={201: {"model": BulkImportResult}},
     status_code=status.HTTP_201_CREATED,
     summary="Bulk import books",
     description="""
@@ -297,12 +321,13 @@ async def bulk_import_books(file: UploadFile, db: AsyncSession = Depends(get_db)
     summary="Health check",
     description="Check if the API and database are working."
 )
-async def healthchecker(db: AsyncSession = Depends(get_db)):
+async def healthchecker(db: AsyncSession = Depends(get_read_db)):
     """
     Health check endpoint.
     """
     try:
         result = await db.execute(text("SELECT 1"))
+        logging.info(f"DB pool status: {sessionmanager.pool_status()}")
         if not result.fetchone():
             raise HTTPException(status_code=500, detail="Database is not configured correctly")
         return {"message": "Welcome to FastAPI!"}
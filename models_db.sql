@@ -20,3 +20,11 @@ CREATE TABLE IF NOT EXISTS books (
     author_id INTEGER NOT NULL REFERENCES authors(id) ON DELETE CASCADE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_books_title_id ON books (title, id);
+CREATE INDEX IF NOT EXISTS ix_books_published_year ON books (published_year);
+CREATE INDEX IF NOT EXISTS ix_books_genre ON books (genre);
+CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_authors_full_name_trgm ON authors USING gin (full_name gin_trgm_ops);
@@ -1,27 +1,35 @@
-from pydantic import BaseModel, validator, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, field_validator, Field, EmailStr
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
-book_genres=['Fiction', 'Non-fiction', 'Science', 'History']
-book_genres_lower = [g.lower() for g in book_genres]
+BOOK_GENRES = ("Fiction", "Non-fiction", "Science", "History")
+BOOK_GENRES_SET = frozenset(BOOK_GENRES)
+_GENRE_CANON = {g.lower(): g for g in BOOK_GENRES}
 DEFAULT_PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
 CURRENT_YEAR = 2025
 
+
+def _canonical_genre(genre: str) -> str:
+    canon = _GENRE_CANON.get(genre.lower())
+    if canon is None:
+        raise ValueError(f"Enter appropriate genre: {', '.join(BOOK_GENRES)}")
+    return canon
+
+
 class BookCreate(BaseModel):
     title: str
     published_year: int
     author: str
     genre: str
     
-    @validator('genre')
+    @field_validator('genre')
+    @classmethod
     def genre_valid(cls, genre):
-        if genre.lower() not in book_genres_lower:
-            raise ValueError(f"Enter appropriate genre: {', '.join(book_genres)}")
-        idx = book_genres_lower.index(genre.lower())
-        return book_genres[idx]
+        return _canonical_genre(genre)
     
-    @validator('published_year')
+    @field_validator('published_year')
+    @classmethod
     def published_year_valid(cls, published_year):
         if published_year < 1800 or published_year > CURRENT_YEAR:
             raise ValueError('Enter a valid published year(between 1800 and Current year)')
@@ -33,21 +41,26 @@ class BookUpdate(BaseModel):
     published_year: Optional[int] = None
     genre: Optional[str] = None
     
-    @validator('published_year')
+    @field_validator('published_year')
+    @classmethod
     def published_year_valid(cls, published_year):
+        if published_year is None:
+            return published_year
         if published_year < 1800 or published_year > CURRENT_YEAR:
             raise ValueError('Enter a valid published year(between 1800 and Current year)')
         return published_year
 
-    @validator('genre')
+    @field_validator('genre')
+    @classmethod
     def genre_valid(cls, genre):
-        if genre.lower() not in book_genres_lower:
-            raise ValueError(f"Enter appropriate genre: {', '.join(book_genres)}")
-        idx = book_genres_lower.index(genre.lower())
-        return book_genres[idx]
+        if genre is None:
+            return genre
+        return _canonical_genre(genre)
 
 
 class BookOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     title: str
     author: str
@@ -56,6 +69,18 @@ class BookOut(BaseModel):
     created_at: datetime
 
 
+class BookCursor(BaseModel):
+    last_title: str
+    last_id: int
+
+
+class PaginatedBooks(BaseModel):
+    items: List[BookOut]
+    total: Optional[int] = None
+    page: int
+    next_cursor: Optional[BookCursor] = None
+
+
 class BulkImportResult(BaseModel):
     inserted: int
     errors: List[Dict[str, Any]]
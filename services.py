@@ -1,31 +1,180 @@
 from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+import asyncio
 import csv
 import io
-import json
+import itertools
+import time
+from functools import lru_cache
+
+import ijson
+import orjson
 
 from fastapi import Depends, HTTPException, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import text, table, column, insert, update, select, bindparam, tuple_
+from sqlalchemy import Integer, String, DateTime, func
 from passlib.context import CryptContext
-from jose import jwt, JWTError
+from cachetools import TTLCache
+from jwt import PyJWT, ExpiredSignatureError, InvalidTokenError
 
 from schemas import (
     UserSignup, UserSignin, BookCreate, BookUpdate, BookOut, BulkImportResult,
-    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CURRENT_YEAR, book_genres
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CURRENT_YEAR, BOOK_GENRES, BOOK_GENRES_SET
 )
 from db import get_db
 from conf.config import config
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
 SECRET_KEY = config.SECRET_KEY_JWT
 ALGORITHM = config.ALGORITHM
+ACCESS_TOKEN_LIFETIME = 15 * 60
+REFRESH_TOKEN_LIFETIME = 7 * 24 * 60 * 60
+
+# PyJWT подписывает HMAC через cryptography/OpenSSL, один экземпляр на весь модуль
+_jwt = PyJWT()
+# Ключ в байтах готовим один раз, чтобы encode/decode не кодировали строку на каждый вызов
+_SIGNING_KEY = SECRET_KEY.encode()
+IMPORT_BATCH_SIZE = 500
+# JSON до этого размера разбирается целиком через orjson, файлы крупнее читаются потоково через ijson
+JSON_LOAD_MAX_BYTES = 8 * 1024 * 1024
+
+# Кэш email -> строка пользователя. Срок жизни токена проверяется _jwt.decode при каждом запросе,
+# кэш лишь избавляет от SELECT users на каждый аутентифицированный запрос
+_user_cache = TTLCache(maxsize=10_000, ttl=60)
+
+# Кэш страниц list_books по параметрам запроса, сбрасывается при любом изменении книг
+_books_cache = TTLCache(maxsize=1_024, ttl=30)
+# Поколение данных книг: растёт при каждом изменении. Страница, запрошенная до изменения,
+# не попадает в кэш после него
+_books_generation = 0
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/test_task/signin")
 
 
+def _invalidate_books():
+    """Сбросить кэш страниц книг после изменения данных"""
+    global _books_generation
+    _books_generation += 1
+    _books_cache.clear()
+
+
+class InFlightCoalescer:
+    """Объединяет одновременные вызовы с одинаковым ключом: запрос в БД выполняет первый,
+    остальные ждут его результат"""
+
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Future] = {}
+
+    async def run(self, key, factory):
+        while (fut := self._inflight.get(key)) is not None:
+            try:
+                # shield: отмена одного ожидающего не должна отменять общий результат
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                # Отменили первый запрос, а не нас: присоединяемся к новому первому,
+                # запрос выполнит только один из ожидавших
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # помечаем исключение прочитанным, если ожидающих не было
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+
+_inflight = InFlightCoalescer()
+
+
+# ---------- Tables & Queries ----------
+# Запросы собираются один раз при импорте модуля и переиспользуются между вызовами,
+# поэтому SQLAlchemy берёт скомпилированный SQL из кэша, а не строит его заново
+
+authors_table = table("authors", column("id", Integer), column("full_name", String))
+books_table = table(
+    "books",
+    column("id", Integer), column("title", String), column("author_id", Integer),
+    column("published_year", Integer), column("genre", String), column("created_at", DateTime),
+)
+
+Q_GET_USER_CREDENTIALS = text("SELECT id, email, hashed_password FROM users WHERE email = :email LIMIT 1")
+Q_GET_CURRENT_USER = text("SELECT id, email FROM users WHERE email = :email LIMIT 1")
+Q_USER_EXISTS = text("SELECT 1 FROM users WHERE email = :email LIMIT 1")
+Q_INSERT_USER = text("""
+    INSERT INTO users (email, username, hashed_password)
+    VALUES (:email, :username, :hashed_password)
+    ON CONFLICT (email) DO NOTHING
+    RETURNING id
+""")
+Q_SET_REFRESH_TOKEN = text("UPDATE users SET refresh_token = :rt WHERE id = :id")
+Q_CLEAR_REFRESH_TOKEN = text("UPDATE users SET refresh_token = NULL WHERE email = :email")
+Q_GET_REFRESH_TOKEN = text("SELECT id, email, refresh_token FROM users WHERE email = :email")
+
+Q_FIND_AUTHOR = text("SELECT id FROM authors WHERE full_name = :full_name")
+Q_FIND_AUTHORS = text(
+    "SELECT id, full_name FROM authors WHERE full_name IN :names ORDER BY id"
+).bindparams(bindparam("names", expanding=True))
+Q_INSERT_AUTHOR = insert(authors_table).returning(authors_table.c.id)
+Q_INSERT_AUTHORS = insert(authors_table).returning(authors_table.c.id, authors_table.c.full_name)
+
+Q_INSERT_BOOK = text("""
+    INSERT INTO books (title, author_id, published_year, genre, created_at)
+    VALUES (:title, :author_id, :published_year, :genre, CURRENT_TIMESTAMP)
+""")
+Q_INSERT_BOOK_RETURNING_ID = text("""
+    INSERT INTO books (title, author_id, published_year, genre, created_at)
+    VALUES (:title, :author_id, :published_year, :genre, CURRENT_TIMESTAMP)
+    RETURNING id
+""")
+Q_BOOK_EXISTS = text("SELECT id FROM books WHERE id = :id")
+Q_DELETE_BOOK = text("DELETE FROM books WHERE id = :id")
+Q_GET_BOOK_BY_ID = text("""
+    SELECT b.id, b.title, a.full_name AS author, b.published_year, b.genre, b.created_at
+    FROM books b
+    JOIN authors a ON a.id = b.author_id
+    WHERE b.id = :id
+""")
+Q_SELECT_BOOKS = select(
+    books_table.c.id,
+    books_table.c.title,
+    authors_table.c.full_name.label("author"),
+    books_table.c.published_year,
+    books_table.c.genre,
+    books_table.c.created_at,
+).select_from(books_table.join(authors_table, authors_table.c.id == books_table.c.author_id))
+# COUNT(*) OVER () считает все строки под фильтром в том же запросе, без отдельного SELECT COUNT
+Q_SELECT_BOOKS_WITH_TOTAL = Q_SELECT_BOOKS.add_columns(func.count().over().label("total_count"))
+
+LIST_SORT_COLUMNS = {
+    "title": books_table.c.title,
+    "published_year": books_table.c.published_year,
+    "author": authors_table.c.full_name,
+}
+# Порядок важен: индекс фильтра задаёт его бит в filter_mask для _build_list_query
+LIST_FILTERS = (
+    ("title", books_table.c.title.ilike(bindparam("title"))),
+    ("author", authors_table.c.full_name.ilike(bindparam("author"))),
+    ("genre", books_table.c.genre.ilike(bindparam("genre"))),
+    ("year_from", books_table.c.published_year >= bindparam("year_from")),
+    ("year_to", books_table.c.published_year <= bindparam("year_to")),
+)
+
+
 # ---------- Auth Helpers ----------
 
 def get_password_hash(password: str) -> str:
@@ -36,30 +185,29 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _create_token(data: dict, lifetime: float, scope: str) -> str:
+    # Один замер времени на токен: iat и exp считаются от одного момента
+    now = int(time.time())
+    payload = {**data, "iat": now, "exp": now + int(lifetime), "scope": scope}
+    return _jwt.encode(payload, _SIGNING_KEY, algorithm=ALGORITHM)
+
+
 def create_access_token(data: dict, expires_delta: Optional[float] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (
-        timedelta(seconds=expires_delta) if expires_delta else timedelta(minutes=15)
-    )
-    to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return _create_token(data, expires_delta or ACCESS_TOKEN_LIFETIME, "access_token")
 
 
-async def create_refresh_token(data: dict, expires_delta: Optional[float] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (
-        timedelta(seconds=expires_delta) if expires_delta else timedelta(days=7)
-    )
-    to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+def create_refresh_token(data: dict, expires_delta: Optional[float] = None) -> str:
+    return _create_token(data, expires_delta or REFRESH_TOKEN_LIFETIME, "refresh_token")
 
 
 async def authenticate_user(db: AsyncSession, email: str, password: str):
-    query = text("SELECT * FROM users WHERE email = :email")
-    result = await db.execute(query, {"email": email})
+    result = await db.execute(Q_GET_USER_CREDENTIALS, {"email": email})
     user = result.mappings().first()
 
-    if user is None or not pwd_context.verify(password, user["hashed_password"]):
+    if user is None:
+        return False
+    # bcrypt нагружает CPU, поэтому выполняем его вне event loop
+    if not await asyncio.to_thread(verify_password, password, user["hashed_password"]):
         return False
     return user
 
@@ -74,47 +222,44 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _jwt.decode(token, _SIGNING_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        query = text("SELECT * FROM users WHERE email = :email LIMIT 1")
-        result = await db.execute(query, {"email": email})
+        user_row = _user_cache.get(email)
+        if user_row is not None:
+            return user_row
+
+        result = await db.execute(Q_GET_CURRENT_USER, {"email": email})
         user_row = result.mappings().first()
 
         if user_row is None:
             raise credentials_exception
 
+        _user_cache[email] = user_row
         return user_row
-    except JWTError:
+    except InvalidTokenError:
         raise credentials_exception
 
 
 # ---------- User Services ----------
 
 async def signup(user: UserSignup, db: AsyncSession) -> Dict[str, Any]:
-    query_check = text("SELECT id FROM users WHERE email = :email")
-    result = await db.execute(query_check, {"email": user.email})
-    if result.scalar():
+    # Дешёвая проверка до bcrypt: повторная регистрация не тратит время на хеширование
+    if (await db.execute(Q_USER_EXISTS, {"email": user.email})).first() is not None:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    query_count = text("SELECT COUNT(*) FROM users")
-    result = await db.execute(query_count)
-    count = result.scalar() or 0
-
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await asyncio.to_thread(get_password_hash, user.password)
 
-    query_insert = text("""
-        INSERT INTO users (email, username, hashed_password)
-        VALUES (:email, :username, :hashed_password)
-        RETURNING id
-    """)
-    result = await db.execute(query_insert, {
+    # ON CONFLICT закрывает гонку между проверкой выше и вставкой
+    result = await db.execute(Q_INSERT_USER, {
         "email": user.email,
         "username": user.username,
         "hashed_password": hashed_password
     })
     new_user_id = result.scalar()
+    if new_user_id is None:
+        raise HTTPException(status_code=400, detail="Email already registered")
     await db.commit()
 
     return {"msg": "User created successfully", 
@@ -129,35 +274,34 @@ async def signin(user: UserSignin, db: AsyncSession) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
     access_token = create_access_token(data={"sub": db_user["email"]})
-    refresh_token = await create_refresh_token(data={"sub": db_user["email"]})
+    refresh_token = create_refresh_token(data={"sub": db_user["email"]})
 
-    query_update = text("UPDATE users SET refresh_token = :rt WHERE id = :id")
-    await db.execute(query_update, {"rt": refresh_token, "id": db_user["id"]})
+    await db.execute(Q_SET_REFRESH_TOKEN, {"rt": refresh_token, "id": db_user["id"]})
     await db.commit()
+    _user_cache.pop(db_user["email"], None)
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 async def signout(user_email: str, db: AsyncSession):
-    query_update = text("UPDATE users SET refresh_token = NULL WHERE email = :email")
-    await db.execute(query_update, {"email": user_email})
+    await db.execute(Q_CLEAR_REFRESH_TOKEN, {"email": user_email})
     await db.commit()
+    _user_cache.pop(user_email, None)
     return {"msg": "Successfully logged out"}
 
 
 async def refresh_token(refresh_token: str, db: AsyncSession):
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _jwt.decode(refresh_token, _SIGNING_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.ExpiredSignatureError:
+    except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    query = text("SELECT id, email, refresh_token FROM users WHERE email = :email")
-    result = await db.execute(query, {"email": email})
+    result = await db.execute(Q_GET_REFRESH_TOKEN, {"email": email})
     user = result.mappings().first()
 
     if user is None or user["refresh_token"] != refresh_token:
@@ -168,26 +312,142 @@ async def refresh_token(refresh_token: str, db: AsyncSession):
 
 # ---------- Helpers ----------
 
+@lru_cache(maxsize=128)
+def _build_list_query(filter_mask: int, sort_by: str, ascending: bool, keyset: bool):
+    """Собрать запрос list_books для набора фильтров. Значения передаются через bind-параметры"""
+    conditions = [cond for bit, (_, cond) in enumerate(LIST_FILTERS) if filter_mask & (1 << bit)]
+    if keyset:
+        # Keyset-пагинация: продолжаем после последней строки вместо OFFSET, индекс (title, id)
+        row_key = tuple_(books_table.c.title, books_table.c.id)
+        cursor = tuple_(bindparam("last_title", type_=String), bindparam("last_id", type_=Integer))
+        conditions.append(row_key > cursor if ascending else row_key < cursor)
+
+    sort_col = LIST_SORT_COLUMNS[sort_by]
+    if ascending:
+        order_by = (sort_col.asc(), books_table.c.id.asc())
+    else:
+        order_by = (sort_col.desc(), books_table.c.id.desc())
+
+    # В режиме курсора WHERE отсекает уже просмотренные строки, поэтому общий счётчик не считаем
+    if keyset:
+        return Q_SELECT_BOOKS.where(*conditions).order_by(*order_by).limit(bindparam("limit", type_=Integer))
+    return (
+        Q_SELECT_BOOKS_WITH_TOTAL.where(*conditions)
+        .order_by(*order_by)
+        .limit(bindparam("limit", type_=Integer))
+        .offset(bindparam("offset", type_=Integer))
+    )
+
+
 async def _get_or_create_author(session: AsyncSession, full_name: str) -> int:
     """Создать автора, если его нет. Вернуть ID"""
     if not full_name.strip():
         raise HTTPException(status_code=400, detail="Author name cannot be empty")
 
-    q_find = text("SELECT id FROM authors WHERE full_name = :full_name")
-    res = await session.execute(q_find, {"full_name": full_name})
+    res = await session.execute(Q_FIND_AUTHOR, {"full_name": full_name})
     row = res.scalar()
     if row:
         return int(row)
 
-    # Для SQLite нельзя использовать RETURNING, поэтому делаем вставку и потом получаем id
-    await session.execute(text("INSERT INTO authors (full_name) VALUES (:full_name)"), {"full_name": full_name})
-    await session.commit()
-    q_last = text("SELECT id FROM authors WHERE full_name = :full_name ORDER BY id DESC LIMIT 1")
-    res = await session.execute(q_last, {"full_name": full_name})
-    author_id = res.scalar()
-    if not author_id:
-        raise HTTPException(status_code=500, detail="Failed to create author")
-    return int(author_id)
+    res = await session.execute(Q_INSERT_AUTHOR, {"full_name": full_name})
+    return int(res.scalar_one())
+
+
+async def _get_or_create_authors(session: AsyncSession, names: set) -> Dict[str, int]:
+    """Вернуть ID для набора авторов: один SELECT и один пакетный INSERT недостающих"""
+    res = await session.execute(Q_FIND_AUTHORS, {"names": list(names)})
+    author_ids: Dict[str, int] = {}
+    for author_id, full_name in res.all():
+        author_ids.setdefault(full_name, int(author_id))
+
+    missing = [name for name in names if name not in author_ids]
+    if missing:
+        res = await session.execute(Q_INSERT_AUTHORS, [{"full_name": name} for name in missing])
+        for author_id, full_name in res.all():
+            author_ids[full_name] = int(author_id)
+    return author_ids
+
+
+def _validate_import_row(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Проверить строку импорта и вернуть нормализованные значения"""
+    title = (raw.get("title") or "").strip()
+    author = (raw.get("author") or "").strip()
+    published_year = raw.get("published_year")
+    genre = raw.get("genre")
+
+    if isinstance(published_year, str) and published_year.isdigit():
+        published_year = int(published_year)
+
+    if not title:
+        raise ValueError("title is required")
+    if not author:
+        raise ValueError("author is required")
+    if not isinstance(published_year, int):
+        raise ValueError("published_year must be integer")
+    if published_year < 1800 or published_year > CURRENT_YEAR:
+        raise ValueError(f"published_year must be between 1800 and {CURRENT_YEAR}")
+    if genre not in BOOK_GENRES_SET:
+        raise ValueError(f"genre must be one of: {', '.join(sorted(BOOK_GENRES))}")
+
+    return {"title": title, "author": author, "published_year": published_year, "genre": genre}
+
+
+def _iter_csv_records(raw):
+    """Строки CSV как dict. newline="" отдаёт разбор переводов строк модулю csv, как требует его документация"""
+    text_file = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    try:
+        yield from csv.DictReader(text_file)
+    finally:
+        # Отсоединяем обёртку, иначе при сборке мусора она закроет файл UploadFile
+        text_file.detach()
+
+
+def _open_import_records(file: UploadFile):
+    """Итератор записей файла импорта. CSV и крупный JSON читаются потоково, без чтения файла целиком"""
+    if file.filename.lower().endswith(".csv"):
+        return _iter_csv_records(file.file)
+
+    # Оставшийся размер загрузки, UploadFile.size заполняется не всегда
+    start = file.file.tell()
+    size = file.file.seek(0, io.SEEK_END) - start
+    file.file.seek(start)
+    if size <= JSON_LOAD_MAX_BYTES:
+        data = orjson.loads(file.file.read())
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="JSON must be an array of book objects")
+        return iter(data)
+
+    events = ijson.parse(file.file)
+    first = next(events, None)
+    if first is None or first[1] != "start_array":
+        raise HTTPException(status_code=400, detail="JSON must be an array of book objects")
+    return ijson.items(itertools.chain([first], events), "item")
+
+
+async def _flush_batch(session: AsyncSession, batch: list, errors: list) -> int:
+    """Проверить пачку строк и вставить валидные одним executemany. Вернуть число вставленных"""
+    valid_rows = []
+    for idx, raw in batch:
+        try:
+            valid_rows.append(_validate_import_row(raw))
+        except Exception as e:
+            errors.append({"row": idx, "error": str(e)})
+
+    if not valid_rows:
+        return 0
+
+    author_ids = await _get_or_create_authors(session, {r["author"] for r in valid_rows})
+    params_list = [
+        {
+            "title": r["title"],
+            "author_id": author_ids[r["author"]],
+            "published_year": r["published_year"],
+            "genre": r["genre"],
+        }
+        for r in valid_rows
+    ]
+    await session.execute(Q_INSERT_BOOK, params_list)
+    return len(valid_rows)
 
 
 # ---------- Book Services ----------
@@ -195,26 +455,18 @@ async def _get_or_create_author(session: AsyncSession, full_name: str) -> int:
 async def create_book(book: BookCreate, db: AsyncSession, current_user: dict) -> BookOut:
     author_id = await _get_or_create_author(db, book.author)
 
-    q_insert = text("""
-        INSERT INTO books (title, author_id, published_year, genre, created_at)
-        VALUES (:title, :author_id, :published_year, :genre, CURRENT_TIMESTAMP)
-    """)
     params = {
         "title": book.title.strip(),
         "author_id": author_id,
         "published_year": book.published_year,
         "genre": book.genre.strip() if book.genre else None,
     }
-    await db.execute(q_insert, params)
+    res = await db.execute(Q_INSERT_BOOK_RETURNING_ID, params)
+    new_id = res.scalar_one()
     await db.commit()
+    _invalidate_books()
 
-    q_select = text("""
-        SELECT b.id, b.title, a.full_name AS author, b.published_year, b.genre, b.created_at
-        FROM books b
-        JOIN authors a ON a.id = b.author_id
-        WHERE b.id = (SELECT MAX(id) FROM books)
-    """)
-    result = await db.execute(q_select)
+    result = await db.execute(Q_GET_BOOK_BY_ID, {"id": new_id})
     created = result.mappings().first()
     if not created:
         raise HTTPException(status_code=500, detail="Failed to create book")
@@ -222,8 +474,7 @@ async def create_book(book: BookCreate, db: AsyncSession, current_user: dict) ->
 
 
 async def update_book(book_id: int, payload: BookUpdate, db: AsyncSession, current_user: dict) -> BookOut:
-    q_load = text("SELECT id FROM books WHERE id = :id")
-    res = await db.execute(q_load, {"id": book_id})
+    res = await db.execute(Q_BOOK_EXISTS, {"id": book_id})
     if not res.scalar():
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -237,90 +488,54 @@ async def update_book(book_id: int, payload: BookUpdate, db: AsyncSession, curre
         update_fields["author_id"] = author_id
 
     if update_fields:
-        set_sql = ", ".join([f"{k} = :{k}" for k in update_fields.keys()])
-        update_fields["id"] = book_id
-        q_upd = text(f"UPDATE books SET {set_sql} WHERE id = :id")
-        await db.execute(q_upd, update_fields)
+        q_upd = update(books_table).where(books_table.c.id == book_id).values(**update_fields)
+        await db.execute(q_upd)
         await db.commit()
+        _invalidate_books()
 
-    return await get_book(book_id, db)
+    # Не через get_book: одновременное чтение могло начаться до нашего UPDATE
+    return await _fetch_book(book_id, db)
 
 
 async def delete_book(book_id: int, db: AsyncSession, current_user: dict) -> bool:
-    q = text("SELECT id FROM books WHERE id = :id")
-    res = await db.execute(q, {"id": book_id})
+    res = await db.execute(Q_BOOK_EXISTS, {"id": book_id})
     if not res.scalar():
         return False
 
-    await db.execute(text("DELETE FROM books WHERE id = :id"), {"id": book_id})
+    await db.execute(Q_DELETE_BOOK, {"id": book_id})
     await db.commit()
+    _invalidate_books()
     return True
 
 
 async def bulk_import(file: UploadFile, db: AsyncSession, current_user: dict) -> BulkImportResult:
     """Импорт книг из CSV или JSON"""
-    content = await file.read()
-    text_content = content.decode("utf-8")
-    rows_to_insert = []
-    errors = []
-
-    if file.filename.lower().endswith(".csv"):
-        try:
-            reader = csv.DictReader(io.StringIO(text_content))
-            for idx, row in enumerate(reader, start=1):
-                rows_to_insert.append((idx, row))
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
-    elif file.filename.lower().endswith(".json"):
-        try:
-            data = json.loads(text_content)
-            if not isinstance(data, list):
-                raise HTTPException(status_code=400, detail="JSON must be an array of book objects")
-            for idx, item in enumerate(data, start=1):
-                rows_to_insert.append((idx, item))
-        except json.JSONDecodeError as e:
-            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    filename = file.filename.lower()
+    if filename.endswith(".csv"):
+        parse_errors = (csv.Error, UnicodeDecodeError)
+        error_label = "Invalid CSV"
+    elif filename.endswith(".json"):
+        parse_errors = (ijson.JSONError, orjson.JSONDecodeError)
+        error_label = "Invalid JSON"
     else:
         raise HTTPException(status_code=400, detail="Unsupported file type. Use .csv or .json")
 
     inserted = 0
-    for idx, raw in rows_to_insert:
-        try:
-            title = (raw.get("title") or "").strip()
-            author = (raw.get("author") or "").strip()
-            published_year = raw.get("published_year")
-            genre = raw.get("genre")
-
-            if isinstance(published_year, str) and published_year.isdigit():
-                published_year = int(published_year)
-
-            if not title:
-                raise ValueError("title is required")
-            if not author:
-                raise ValueError("author is required")
-            if not isinstance(published_year, int):
-                raise ValueError("published_year must be integer")
-            if published_year < 1800 or published_year > CURRENT_YEAR:
-                raise ValueError(f"published_year must be between 1800 and {CURRENT_YEAR}")
-            if genre not in book_genres:
-                raise ValueError(f"genre must be one of: {', '.join(sorted(book_genres))}")
-
-            author_id = await _get_or_create_author(db, author)
-            q_insert = text("""
-                INSERT INTO books (title, author_id, published_year, genre, created_at)
-                VALUES (:title, :author_id, :published_year, :genre, CURRENT_TIMESTAMP)
-            """)
-            await db.execute(q_insert, {
-                "title": title,
-                "author_id": author_id,
-                "published_year": published_year,
-                "genre": genre,
-            })
-            inserted += 1
-        except Exception as e:
-            errors.append({"row": idx, "error": str(e)})
+    errors = []
+    try:
+        records = enumerate(await run_in_threadpool(_open_import_records, file), start=1)
+        while True:
+            # Чтение и разбор файла блокирующие, поэтому каждую пачку читаем в пуле потоков
+            batch = await run_in_threadpool(lambda: list(itertools.islice(records, IMPORT_BATCH_SIZE)))
+            if not batch:
+                break
+            inserted += await _flush_batch(db, batch, errors)
+    except parse_errors as e:
+        raise HTTPException(status_code=400, detail=f"{error_label}: {str(e)}")
 
     await db.commit()
+    if inserted:
+        _invalidate_books()
     return BulkImportResult(inserted=inserted, errors=errors)
 
 
@@ -335,7 +550,10 @@ async def list_books(
     year_to: Optional[int] = None,
     sort_by: str = "title",
     sort_order: str = "asc",
-) -> List[BookOut]:
+    last_title: Optional[str] = None,
+    last_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Страница книг в виде готовых к сериализации dict, без промежуточных моделей Pydantic"""
 
     try:
         page = int(page)
@@ -343,60 +561,105 @@ async def list_books(
     except (ValueError, TypeError):
         raise HTTPException(status_code=400, detail="page and page_size must be integers")
     
-    allowed_sort_columns = {"title": "b.title", "published_year": "b.published_year", "author": "a.full_name"}
-    sort_col = allowed_sort_columns.get(sort_by)
-    if not sort_col:
-        raise HTTPException(status_code=400, detail=f"sort_by must be one of {list(allowed_sort_columns.keys())}")
+    if sort_by not in LIST_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {list(LIST_SORT_COLUMNS.keys())}")
 
     if sort_order.lower() not in {"asc", "desc"}:
         raise HTTPException(status_code=400, detail="sort_order must be 'asc' or 'desc'")
 
-    where_clauses = []
-    params: Dict[str, Any] = {}
-
-    if title:
-        where_clauses.append("b.title ILIKE :title")
-        params["title"] = f"%{title}%"
-    if author:
-        where_clauses.append("a.full_name ILIKE :author")
-        params["author"] = f"%{author}%"
-    if genre:
-        where_clauses.append("b.genre ILIKE :genre")
-        params["genre"] = f"%{genre}%"
-    if year_from:
-        where_clauses.append("b.published_year >= :year_from")
-        params["year_from"] = year_from
-    if year_to:
-        where_clauses.append("b.published_year <= :year_to")
-        params["year_to"] = year_to
-
-    where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-    order_sql = f"ORDER BY {sort_col} {sort_order.upper()}"
-    offset = (page - 1) * page_size
-    params.update({"limit": page_size, "offset": offset})
-
-    q = text(f"""
-        SELECT b.id, b.title, a.full_name AS author, b.published_year, b.genre, b.created_at
-        FROM books b
-        JOIN authors a ON a.id = b.author_id
-        {where_sql}
-        {order_sql}
-        LIMIT :limit OFFSET :offset
-    """)
+    keyset = last_title is not None or last_id is not None
+    if keyset and (last_title is None or last_id is None):
+        raise HTTPException(status_code=400, detail="last_title and last_id must be passed together")
+    if keyset and sort_by != "title":
+        raise HTTPException(status_code=400, detail="last_title/last_id cursor requires sort_by=title")
 
+    cache_key = (
+        page, page_size, title, author, genre, year_from, year_to,
+        sort_by, sort_order.lower(), last_title, last_id,
+    )
+    cached = _books_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = _books_generation
+    # Поколение в ключе: чтение, начатое после записи, не присоединяется к запросу, начатому до неё
+    return await _inflight.run(
+        ("books", generation, cache_key),
+        lambda: _fetch_books_page(
+            db, cache_key, generation, page, page_size, title, author, genre, year_from, year_to,
+            sort_by, sort_order, last_title, last_id,
+        ),
+    )
+
+
+async def _fetch_books_page(
+    db: AsyncSession,
+    cache_key: tuple,
+    generation: int,
+    page: int,
+    page_size: int,
+    title: Optional[str],
+    author: Optional[str],
+    genre: Optional[str],
+    year_from: Optional[int],
+    year_to: Optional[int],
+    sort_by: str,
+    sort_order: str,
+    last_title: Optional[str],
+    last_id: Optional[int],
+) -> Dict[str, Any]:
+    keyset = last_title is not None
+    filter_values = (
+        f"%{title}%" if title else None,
+        f"%{author}%" if author else None,
+        f"%{genre}%" if genre else None,
+        year_from or None,
+        year_to or None,
+    )
+    filter_mask = 0
+    # Лишняя строка показывает, есть ли следующая страница, без отдельного запроса
+    params: Dict[str, Any] = {"limit": page_size + 1}
+    for bit, ((name, _), value) in enumerate(zip(LIST_FILTERS, filter_values)):
+        if value is not None:
+            filter_mask |= 1 << bit
+            params[name] = value
+    if keyset:
+        params["last_title"] = last_title
+        params["last_id"] = last_id
+    else:
+        params["offset"] = (page - 1) * page_size
+
+    q = _build_list_query(filter_mask, sort_by, sort_order.lower() == "asc", keyset)
     result = await db.execute(q, params)
     rows = result.mappings().all()
-    return [BookOut(**r) for r in rows]
+    has_more = len(rows) > page_size
+    items = [dict(r) for r in rows[:page_size]]
+
+    total = None
+    if not keyset:
+        # За последней страницей строк нет и счётчик неизвестен: null, а не «ноль совпадений»
+        if items:
+            total = items[0]["total_count"]
+        elif page == 1:
+            total = 0
+        for item in items:
+            del item["total_count"]
+
+    next_cursor = None
+    if sort_by == "title" and has_more:
+        next_cursor = {"last_title": items[-1]["title"], "last_id": items[-1]["id"]}
+    books_page = {"items": items, "total": total, "page": page, "next_cursor": next_cursor}
+    # Если за время запроса книги изменились, страница уже устарела и в кэш не кладётся
+    if _books_generation == generation:
+        _books_cache[cache_key] = books_page
+    return books_page
 
 
 async def get_book(book_id: int, db: AsyncSession) -> BookOut:
-    q = text("""
-        SELECT b.id, b.title, a.full_name AS author, b.published_year, b.genre, b.created_at
-        FROM books b
-        JOIN authors a ON a.id = b.author_id
-        WHERE b.id = :id
-    """)
-    result = await db.execute(q, {"id": book_id})
+    return await _inflight.run(("book", _books_generation, book_id), lambda: _fetch_book(book_id, db))
+
+
+async def _fetch_book(book_id: int, db: AsyncSession) -> BookOut:
+    result = await db.execute(Q_GET_BOOK_BY_ID, {"id": book_id})
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Book not found")
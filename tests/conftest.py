@@ -1,30 +1,54 @@
 import sys
-import pathlib
 import os
+import pathlib
 
 import pytest_asyncio
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
 
+# Минимальная стоимость bcrypt для тестов, задаётся до импорта приложения
+os.environ["BCRYPT_ROUNDS"] = "4"
+
 import pytest
-from sqlalchemy import text
+from sqlalchemy import event
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from httpx import AsyncClient, ASGITransport
 from asgi_lifespan import LifespanManager
-from main import app
-from db import get_db
+import main
+from db import get_db, get_read_db
+from services import pwd_context, create_access_token, Q_INSERT_USER, _invalidate_books
 
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
 
-TEST_DATABASE_URL = "sqlite+aiosqlite:///./test_db.sqlite" 
+# Под pytest-xdist у каждого воркера своя именованная in-memory БД
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "main")
+TEST_DATABASE_URL = f"sqlite+aiosqlite:///file:test_db_{WORKER_ID}?mode=memory&cache=shared&uri=true"
 
 engine = create_async_engine(
     TEST_DATABASE_URL,
     echo=False,
-    connect_args={"check_same_thread": False} 
+    poolclass=StaticPool,
+    connect_args={"check_same_thread": False, "uri": True}
 )
 
+
+# Транзакциями управляет SQLAlchemy, а не драйвер sqlite3: иначе SAVEPOINT в db_session
+# открывает собственную транзакцию и commit в сервисах фиксирует данные теста
+@event.listens_for(engine.sync_engine, "connect")
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine.sync_engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     expire_on_commit=False,
@@ -32,28 +56,69 @@ AsyncSessionLocal = sessionmaker(
 )
 
 async def init_db():
-    db_path = "./test_db.sqlite"
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    with open("db_mig_tests.sql", "r") as f:
+        sql = f.read()
     async with engine.begin() as conn:
-        with open("db_mig_tests.sql", "r") as f:
-            sql = f.read()
-        for statement in sql.split(";"):
-            stmt = statement.strip()
-            if stmt:
-                await conn.execute(text(stmt))
-
-@pytest_asyncio.fixture(scope="module")
-async def db_session():
+        raw_conn = await conn.get_raw_connection()
+        await raw_conn.driver_connection.executescript(sql)
+
+if uvloop is not None and sys.platform != "win32":
+    # Если uvloop установлен, тесты крутятся на нём: планировщик заметно быстрее стандартного
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        return {"uvloop": uvloop.new_event_loop}
+
+@pytest.fixture(scope="session", autouse=True)
+def _warmup_bcrypt():
+    # Первый hash в passlib загружает нативный bcrypt, эта задержка не должна попадать в первый тест
+    pwd_context.hash("warmup")
+
+@pytest_asyncio.fixture(scope="session")
+async def database():
     await init_db()
+    yield engine
+
+@pytest_asyncio.fixture
+async def db_session(database):
+    # Каждый тест работает во внешней транзакции, commit в сервисах лишь освобождает SAVEPOINT,
+    # а в конце теста всё откатывается
+    async with database.connect() as conn:
+        trans = await conn.begin()
+        session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        yield session
+        await session.close()
+        await trans.rollback()
+        # Откат не проходит через сервисы, поэтому кэш страниц сбрасываем сами
+        _invalidate_books()
+
+async def _get_test_db():
     async with AsyncSessionLocal() as session:
         yield session
 
-@pytest_asyncio.fixture(scope="module")
-async def client(db_session):
-    app.dependency_overrides[get_db] = lambda: db_session
+@pytest.fixture(scope="session")
+def app():
+    # Приложение и его lifespan поднимаются один раз на сессию, все тесты делят один client
+    return main.app
+
+@pytest_asyncio.fixture(scope="session")
+async def client(app, database):
+    app.dependency_overrides[get_db] = _get_test_db
+    app.dependency_overrides[get_read_db] = _get_test_db
     async with LifespanManager(app):
         transport = ASGITransport(app=app)
         async with AsyncClient(base_url="http://test", transport=transport) as ac:
             yield ac
     app.dependency_overrides.clear()
+
+async def issue_token(db, email="authed@example.com", username="authed"):
+    # Пользователь создаётся напрямую в БД, токен выпускается в процессе: без HTTP signup/signin и bcrypt
+    await db.execute(Q_INSERT_USER, {"email": email, "username": username, "hashed_password": "!"})
+    await db.commit()
+    return create_access_token({"sub": email})
+
+@pytest_asyncio.fixture(scope="session")
+async def authed_client(client):
+    async with AsyncSessionLocal() as db:
+        token = await issue_token(db)
+    headers = {"Authorization": f"Bearer {token}"}
+    yield client, headers
@@ -1,11 +1,16 @@
 import sys
 import pathlib
-import uuid
+import itertools
+import orjson
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
 
 import pytest
 
+_COUNTER = itertools.count()
+_CSV_BYTES = b"title,author,published_year,genre\nBook1,Author1,2020,Fiction"
+_BOOK_BODY = orjson.dumps({"title": "Book1", "author": "Author1", "published_year": 2020, "genre": "Fiction"})
+
 @pytest.mark.asyncio
 async def test_healthchecker(client):
     response = await client.get("/api/healthchecker")
@@ -14,9 +19,9 @@ async def test_healthchecker(client):
 
 async def signup_user(client, email=None, username=None, password="secret"):
     if email is None:
-        email = f"user_{uuid.uuid4().hex}@example.com"
+        email = f"user_{next(_COUNTER):08x}@example.com"
     if username is None:
-        username = f"user_{uuid.uuid4().hex[:8]}"
+        username = f"user_{next(_COUNTER):08x}"
     signup_data = {"email": email, "username": username, "password": password}
     response = await client.post("/test_task/signup", json=signup_data)
     assert response.status_code in (201, 409)
@@ -36,13 +41,12 @@ async def test_signup_and_signin(client):
     assert token
 
 @pytest.mark.asyncio
-async def test_create_get_delete_book(client):
-    email, username, password = await signup_user(client)
-    access_token = await get_valid_token(client, email=email, password=password)
-    headers = {"Authorization": f"Bearer {access_token}"}
+async def test_create_get_delete_book(authed_client):
+    client, headers = authed_client
 
-    book_data = {"title": "Book1", "author": "Author1", "published_year": 2020, "genre": "Fiction"}
-    response = await client.post("/test_task/", json=book_data, headers=headers)
+    response = await client.post(
+        "/test_task/", content=_BOOK_BODY, headers={**headers, "Content-Type": "application/json"}
+    )
     assert response.status_code == 201
     book_id = response.json()["id"]
 
@@ -54,14 +58,63 @@ async def test_create_get_delete_book(client):
     assert response.status_code == 204
 
 @pytest.mark.asyncio
-async def test_bulk_import_endpoint(client):
-    email, username, password = await signup_user(client)
-    access_token = await get_valid_token(client, email=email, password=password)
-    headers = {"Authorization": f"Bearer {access_token}"}
-    csv_content = "title,author,published_year,genre\nBook1,Author1,2020,Fiction"
-    files = {"file": ("books.csv", csv_content, "text/csv")}
+async def test_bulk_import_endpoint(authed_client):
+    client, headers = authed_client
+    files = {"file": ("books.csv", _CSV_BYTES, "text/csv")}
     response = await client.post("/test_task/bulk-import", files=files, headers=headers)
     assert response.status_code == 201
     json_resp = response.json()
     assert "inserted" in json_resp
-    assert "errors" in json_resp
\ No newline at end of file
+    assert "errors" in json_resp
+
+_KEYSET_TITLES = ("Keyset A", "Keyset B", "Keyset B", "Keyset C")
+
+async def _walk_pages(client, sort_order):
+    params = {"title": "Keyset", "page_size": 2, "sort_order": sort_order}
+    ids, requests = [], 0
+    while True:
+        response = await client.get("/test_task/", params=params)
+        assert response.status_code == 200
+        requests += 1
+        body = response.json()
+        ids.extend(book["id"] for book in body["items"])
+        if body["next_cursor"] is None:
+            return ids, requests
+        params.update(body["next_cursor"])
+
+@pytest.mark.asyncio
+async def test_list_books_keyset_pagination(authed_client):
+    client, headers = authed_client
+    created = []
+    for title in _KEYSET_TITLES:
+        book = {"title": title, "author": "Keyset Author", "published_year": 2020, "genre": "Fiction"}
+        response = await client.post("/test_task/", json=book, headers=headers)
+        assert response.status_code == 201
+        created.append((title, response.json()["id"]))
+    expected = [book_id for _, book_id in sorted(created)]
+
+    ids, requests = await _walk_pages(client, "asc")
+    assert ids == expected
+    # Последняя полная страница не требует лишнего пустого запроса
+    assert requests == 2
+
+    ids, requests = await _walk_pages(client, "desc")
+    assert ids == expected[::-1]
+    assert requests == 2
+
+    response = await client.get("/test_task/", params={"last_title": "Keyset A"})
+    assert response.status_code == 400
+    response = await client.get("/test_task/", params={"last_title": "Keyset A", "last_id": 1, "sort_by": "author"})
+    assert response.status_code == 400
+
+    response = await client.get("/test_task/", params={"title": "Keyset", "page_size": 2})
+    assert response.json()["total"] == len(_KEYSET_TITLES)
+    response = await client.get("/test_task/", params={"title": "Keyset", "page_size": 2, "page": 5})
+    assert response.json()["items"] == []
+    assert response.json()["total"] is None
+    response = await client.get("/test_task/", params={"title": "No Such Keyset"})
+    assert response.json()["total"] == 0
+
+    for _, book_id in created:
+        response = await client.delete(f"/test_task/{book_id}", headers=headers)
+        assert response.status_code == 204
@@ -1,43 +1,159 @@
 import sys
 import pathlib
 import io
-import json
+import asyncio
+import orjson
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
 
 import pytest
-from fastapi import UploadFile
+from fastapi import UploadFile, HTTPException
 from schemas import UserSignup, UserSignin, BookCreate
-from services import signup, signin, create_book, bulk_import
+import services
+from services import signup, signin, create_book, bulk_import, list_books
+
+_BOOKS = (
+    {"title": "The Hobbit", "author": "J.R.R. Tolkien", "published_year": 1937, "genre": "History"},
+    {"title": "Dune", "author": "Frank Herbert", "published_year": 1965, "genre": "Fiction"},
+    {"title": "Invalid Book", "author": "Unknown", "published_year": "Year2020", "genre": "Fiction"},
+)
+_BOOKS_PAYLOAD = orjson.dumps(_BOOKS)
 
 @pytest.mark.asyncio
 async def test_signup(db_session):
+    # Единственный тест с полной валидацией схемы, остальные собирают заведомо корректные данные без неё
     user = UserSignup(email="test@example.com", username="testuser", password="password123")
     result = await signup(user, db_session)
     assert result["email"] == "test@example.com"
 
+@pytest.mark.asyncio
+async def test_signup_duplicate_email(db_session):
+    user = UserSignup.model_construct(email="dup@example.com", username="dupuser", password="password123")
+    await signup(user, db_session)
+    with pytest.raises(HTTPException) as exc_info:
+        await signup(user, db_session)
+    assert exc_info.value.status_code == 400
+
 @pytest.mark.asyncio
 async def test_signin(db_session):
-    user_signin = UserSignin(email="test@example.com", password="password123")
+    user = UserSignup.model_construct(email="test@example.com", username="testuser", password="password123")
+    await signup(user, db_session)
+    user_signin = UserSignin.model_construct(email="test@example.com", password="password123")
     result = await signin(user_signin, db_session)
     assert "access_token" in result
 
 @pytest.mark.asyncio
 async def test_create_book(db_session):
-    book = BookCreate(title="Test Book", author="Author", published_year=2020, genre="Fiction")
+    book = BookCreate.model_construct(title="Test Book", author="Author", published_year=2020, genre="Fiction")
     user = {"id": 1} 
     result = await create_book(book, db_session, user)
     assert result.title == "Test Book"
 
 @pytest.mark.asyncio
 async def test_bulk_import(db_session):
-    books = [
-        {"title": "The Hobbit", "author": "J.R.R. Tolkien", "published_year": 1937, "genre": "History"},
-        {"title": "Dune", "author": "Frank Herbert", "published_year": 1965, "genre": "Fiction"},
-        {"title": "Invalid Book", "author": "Unknown", "published_year": "Year2020", "genre": "Fiction"}
-    ]
-    json_content = json.dumps(books)
-    upload_file = UploadFile(filename="books.json", file=io.BytesIO(json_content.encode()))
+    upload_file = UploadFile(filename="books.json", file=io.BytesIO(_BOOKS_PAYLOAD))
     user = {"id": 1}
     result = await bulk_import(upload_file, db_session, user)
     assert result.inserted == 2
     assert len(result.errors) == 1
+
+@pytest.mark.asyncio
+async def test_list_books_cache_invalidated_by_write(db_session):
+    before = await list_books(db_session, title="Cache Probe")
+    assert before["total"] == 0
+    assert await list_books(db_session, title="Cache Probe") is before
+
+    book = BookCreate.model_construct(title="Cache Probe", author="Author", published_year=2020, genre="Fiction")
+    await create_book(book, db_session, {"id": 1})
+    after = await list_books(db_session, title="Cache Probe")
+    assert after["total"] == 1
+
+@pytest.mark.asyncio
+async def test_list_books_skips_cache_for_page_read_before_write(db_session):
+    book = BookCreate.model_construct(title="Race Probe", author="Author", published_year=2020, genre="Fiction")
+
+    class WriteDuringQuery:
+        """Сессия, в которой запись фиксируется, пока выполняется запрос списка"""
+        async def execute(self, *args, **kwargs):
+            result = await db_session.execute(*args, **kwargs)
+            await create_book(book, db_session, {"id": 1})
+            return result
+
+    stale = await list_books(WriteDuringQuery(), title="Race Probe")
+    assert stale["total"] == 0
+    fresh = await list_books(db_session, title="Race Probe")
+    assert fresh["total"] == 1
+
+@pytest.mark.asyncio
+async def test_bulk_import_csv_unicode_line_separators(db_session):
+    # Внутри поля \u2028 и \x0c не являются концом строки CSV
+    payload = (
+        "title,author,published_year,genre\n"
+        "Sep\u2028Title,C,2021,Fiction\n"
+        "Form\x0cFeed,C,2021,Fiction\n"
+    ).encode("utf-8")
+    upload_file = UploadFile(filename="books.csv", file=io.BytesIO(payload))
+    result = await bulk_import(upload_file, db_session, {"id": 1})
+    assert result.inserted == 2
+    assert result.errors == []
+    assert not upload_file.file.closed
+
+@pytest.mark.asyncio
+async def test_bulk_import_json_streaming(db_session, monkeypatch):
+    # Порог ниже размера файла, чтобы пройти потоковую ветку ijson вместо orjson
+    monkeypatch.setattr(services, "JSON_LOAD_MAX_BYTES", 1)
+    upload_file = UploadFile(filename="books.json", file=io.BytesIO(_BOOKS_PAYLOAD))
+    result = await bulk_import(upload_file, db_session, {"id": 1})
+    assert result.inserted == 2
+    assert len(result.errors) == 1
+
+    upload_file = UploadFile(filename="books.json", file=io.BytesIO(b'{"a": 1}'))
+    with pytest.raises(HTTPException) as exc_info:
+        await bulk_import(upload_file, db_session, {"id": 1})
+    assert exc_info.value.status_code == 400
+
+def _counting_factory(calls, result=None, exc=None):
+    async def factory():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        if exc is not None:
+            raise exc
+        return result
+    return factory
+
+@pytest.mark.asyncio
+async def test_inflight_coalescer_shares_result():
+    coalescer = services.InFlightCoalescer()
+    calls = []
+    factory = _counting_factory(calls, result={"value": 1})
+    results = await asyncio.gather(*(coalescer.run("key", factory) for _ in range(3)))
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert not coalescer._inflight
+
+@pytest.mark.asyncio
+async def test_inflight_coalescer_fans_out_exception():
+    coalescer = services.InFlightCoalescer()
+    calls = []
+    factory = _counting_factory(calls, exc=ValueError("boom"))
+    results = await asyncio.gather(*(coalescer.run("key", factory) for _ in range(3)), return_exceptions=True)
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert not coalescer._inflight
+
+@pytest.mark.asyncio
+async def test_inflight_coalescer_leader_cancelled():
+    coalescer = services.InFlightCoalescer()
+    calls = []
+    factory = _counting_factory(calls, result="ok")
+    leader = asyncio.create_task(coalescer.run("key", factory))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(coalescer.run("key", factory)) for _ in range(2)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.gather(*waiters) == ["ok", "ok"]
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # Первый запрос и ровно один повторный от нового первого из ожидавших
+    assert len(calls) == 2
+    assert not coalescer._inflight